@@ -8,19 +8,46 @@ Exposes a POST /run-experiment endpoint that:
 
 This is the single entry point for `modal deploy`. All Modal-decorated
 functions live here; helper modules (persona_generator, experiment_runner,
-sentiment) are pure Python with no Modal dependencies.
+prompt_utils, sentiment, ...) are pure Python with no Modal dependencies.
 """
 
+import itertools
 import json
 import time
+from collections import defaultdict
 
 import modal
 
 app = modal.App("unheard-experiments")
 
+# Personas answered per Claude call; 1 runs every persona in its own call.
+# Batching is opt-in via execution.batchSize.
+_DEFAULT_BATCH_SIZE = 1
+
+# Cap on response text (in characters) kept in memory for the insight and
+# Van Westendorp phases. Past it, responses are streamed but left out of those
+# phases, so a large fan-out cannot exhaust the endpoint container's memory.
+_MAX_BUFFERED_RESPONSE_CHARS = 50_000_000
+
+# Anthropic clients shared by all inputs a warm container serves, so their
+# pooled HTTP connections (and TLS sessions) are reused between calls.
+_client = None
+_async_client = None
+
+# Experiment settings read from a run's shared modal.Dict, cached per
+# container and keyed by the Dict's object id.
+_shared_settings: dict[str, dict] = {}
+_MAX_CACHED_SETTINGS = 32
+
 image = (
     modal.Image.debian_slim(python_version="3.11")
-    .pip_install("anthropic>=0.40.0", "fastapi[standard]")
+    .pip_install(
+        "anthropic>=0.40.0",
+        "fastapi[standard]",
+        "numpy>=1.24",
+        "orjson>=3.9",
+        "pyahocorasick>=2.0",
+    )
     .add_local_python_source("modal_functions")
 )
 
@@ -31,28 +58,48 @@ image = (
     timeout=120,
     retries=1,
 )
-def execute_single_persona(
-    persona: dict,
-    stimulus: str,
-    model: str = "claude-sonnet-4-5-20250929",
-    temperature: float = 0.7,
-    max_tokens: int = 500,
-) -> dict:
+@modal.concurrent(max_inputs=10)
+async def execute_single_persona(persona: dict, shared: modal.Dict) -> dict:
     """Execute a single persona's response as an isolated Modal function.
 
-    Delegates to the pure-Python helper so this function body stays minimal.
+    ``shared`` holds the run's stimulus, model and sampling settings (see
+    _persona_results). Async so one container can overlap up to 10 in-flight
+    Claude calls. Delegates to the pure-Python helper so this function body
+    stays minimal.
     """
-    from anthropic import Anthropic
-    from modal_functions.experiment_runner import execute_persona
+    from modal_functions.experiment_runner import execute_persona_async
 
-    client = Anthropic()
-    return execute_persona(
-        client=client,
+    settings = await _load_shared_settings(shared)
+    return await execute_persona_async(
+        client=_get_async_client(),
         persona=persona,
-        stimulus=stimulus,
-        model=model,
-        temperature=temperature,
-        max_tokens=max_tokens,
+        **settings,
+    )
+
+
+@app.function(
+    image=image,
+    secrets=[modal.Secret.from_name("anthropic-key")],
+    timeout=300,
+    retries=1,
+)
+@modal.concurrent(max_inputs=10)
+async def execute_batched_personas(
+    personas: list[dict], shared: modal.Dict
+) -> list[dict]:
+    """Execute a batch of persona responses in a single Claude call.
+
+    Same inputs and concurrency as execute_single_persona, but takes a list
+    of personas and returns their results in the same order. The longer
+    timeout covers the batch's combined output and any per-persona re-runs.
+    """
+    from modal_functions.experiment_runner import execute_persona_batch_async
+
+    settings = await _load_shared_settings(shared)
+    return await execute_persona_batch_async(
+        client=_get_async_client(),
+        personas=personas,
+        **settings,
     )
 
 
@@ -79,18 +126,25 @@ def run_experiment(body: dict):
             temperature: float - Sampling temperature
             maxTokens: int - Max tokens per response
             timeout: int - Per-response timeout in seconds
+            batchSize: int (optional) - Personas answered per Claude call,
+                capped so a batch stays under MAX_BATCH_OUTPUT_TOKENS;
+                1 (the default) gives every persona its own call
         context: dict (optional) - Context files information
 
     Response: Streaming NDJSON with types:
         status - Progress updates
         persona_generated - Individual persona created
         response_complete - Individual persona response finished
-        experiment_complete - All results with aggregate metrics
+        experiment_complete - Aggregate metrics (rows were already streamed
+            as response_complete events)
         insights_extracted - AI-extracted themes, recommendations, concerns
     """
-    from anthropic import Anthropic
     from starlette.responses import StreamingResponse
 
+    from modal_functions.experiment_runner import (
+        MAX_BATCH_OUTPUT_TOKENS,
+        prime_scenario_cache,
+    )
     from modal_functions.insight_extractor import extract_insights
     from modal_functions.persona_generator import generate_personas
     from modal_functions.van_westendorp import calculate_van_westendorp
@@ -105,6 +159,8 @@ def run_experiment(body: dict):
     resp_model = execution_config.get("model", "claude-sonnet-4-5-20250929")
     temperature = execution_config.get("temperature", 0.7)
     max_tokens = execution_config.get("maxTokens", 500)
+    batch_size = int(execution_config.get("batchSize") or _DEFAULT_BATCH_SIZE)
+    batch_size = max(1, min(batch_size, MAX_BATCH_OUTPUT_TOKENS // max(1, max_tokens)))
 
     # Map config model names to valid Anthropic model IDs
     model_mapping = {
@@ -129,7 +185,7 @@ def run_experiment(body: dict):
             "experiment_id": experiment_id,
         })
 
-        client = Anthropic()
+        client = _get_client()
 
         archetypes = personas_config.get("archetypes", [])
         personas = generate_personas(
@@ -150,27 +206,55 @@ def run_experiment(body: dict):
                 "archetype_name": persona["archetype_name"],
             })
 
-        # Phase 2: Execute all personas in parallel via Modal .map()
+        # Phase 2: Fan personas out to the Modal workers (see _persona_results)
         yield _ndjson_line({
             "type": "status",
             "message": f"Running {len(personas)} persona responses in parallel...",
             "experiment_id": experiment_id,
         })
 
-        results = []
-        for result in execute_single_persona.map(
+        # Write the shared scenario prefix to the prompt cache first, so the
+        # fanned-out calls read it instead of each paying to write it
+        if len(personas) > batch_size:
+            primed = prime_scenario_cache(
+                client, stimulus_text, resp_model, batched=batch_size > 1
+            )
+            total_tokens["input"] += primed.get("input", 0)
+            total_tokens["output"] += primed.get("output", 0)
+
+        persona_results = _persona_results(
             personas,
-            kwargs={
+            settings={
                 "stimulus": stimulus_text,
                 "model": resp_model,
                 "temperature": temperature,
                 "max_tokens": max_tokens,
             },
-        ):
-            results.append(result)
+            batch_size=batch_size,
+        )
+
+        # Aggregate metrics as results stream in, so Phase 3 needs no
+        # further passes over the result list.
+        results = []
+        successful_count = 0
+        failed_count = 0
+        sentiment_sum = 0.0
+        archetype_sums = defaultdict(lambda: [0.0, 0])
+        buffered_chars = 0
+        unbuffered_count = 0
+        for result in persona_results:
             total_tokens["input"] += result.get("tokens", {}).get("input", 0)
             total_tokens["output"] += result.get("tokens", {}).get("output", 0)
 
+            if result.get("error") is None:
+                successful_count += 1
+                sentiment_sum += result["sentiment"]
+                arch_sum = archetype_sums[result.get("archetype_name", "unknown")]
+                arch_sum[0] += result["sentiment"]
+                arch_sum[1] += 1
+            else:
+                failed_count += 1
+
             yield _ndjson_line({
                 "type": "response_complete",
                 "experiment_id": experiment_id,
@@ -181,44 +265,42 @@ def run_experiment(body: dict):
                 "response": result["response"],
                 "sentiment": result["sentiment"],
                 "tokens": result.get("tokens", {}),
+                "ttft_seconds": result.get("ttft_seconds"),
                 "error": result.get("error"),
             })
 
+            # The client already has the row; keep it for analysis only
+            # within budget
+            response_chars = len(result["response"] or "")
+            if buffered_chars + response_chars > _MAX_BUFFERED_RESPONSE_CHARS:
+                unbuffered_count += 1
+            else:
+                buffered_chars += response_chars
+                results.append(result)
+
         # Phase 3: Compute aggregate metrics
         elapsed = round(time.time() - start_time, 2)
-        successful = [r for r in results if r.get("error") is None]
-        failed = [r for r in results if r.get("error") is not None]
-
-        sentiments = [r["sentiment"] for r in successful]
         avg_sentiment = (
-            round(sum(sentiments) / len(sentiments), 3) if sentiments else 0.0
+            round(sentiment_sum / successful_count, 3) if successful_count else 0.0
         )
-
-        # Group results by archetype
-        by_archetype = {}
-        for r in successful:
-            arch = r.get("archetype_name", "unknown")
-            if arch not in by_archetype:
-                by_archetype[arch] = []
-            by_archetype[arch].append(r["sentiment"])
-
         archetype_sentiments = {
-            arch: round(sum(scores) / len(scores), 3)
-            for arch, scores in by_archetype.items()
+            arch: round(total / count, 3)
+            for arch, (total, count) in archetype_sums.items()
         }
 
         yield _ndjson_line({
             "type": "experiment_complete",
             "experiment_id": experiment_id,
-            "results": results,
             "metrics": {
                 "total_personas": len(personas),
-                "successful_responses": len(successful),
-                "failed_responses": len(failed),
+                "successful_responses": successful_count,
+                "failed_responses": failed_count,
                 "avg_sentiment": avg_sentiment,
                 "archetype_sentiments": archetype_sentiments,
                 "total_tokens": total_tokens,
                 "elapsed_seconds": elapsed,
+                "buffered_response_chars": buffered_chars,
+                "unbuffered_responses": unbuffered_count,
             },
         })
 
@@ -249,7 +331,7 @@ def run_experiment(body: dict):
                 "message": "Running Van Westendorp analysis...",
                 "experiment_id": experiment_id,
             })
-            vw_results = calculate_van_westendorp(results)
+            vw_results = calculate_van_westendorp(results, include_cumulative_data=True)
             insights["van_westendorp"] = vw_results
 
         yield _ndjson_line({
@@ -268,6 +350,74 @@ def run_experiment(body: dict):
     )
 
 
-def _ndjson_line(data: dict) -> str:
-    """Serialize a dict as a single NDJSON line (JSON + newline)."""
-    return json.dumps(data, default=str) + "\n"
+def _persona_results(personas: list[dict], settings: dict, batch_size: int):
+    """Fan personas out to the Modal workers and yield results as they finish.
+
+    The settings shared by every persona (stimulus, model, sampling) are
+    written once to an ephemeral modal.Dict, so each input only ships its
+    persona(s) and the Dict handle instead of re-sending the stimulus.
+    """
+    with modal.Dict.ephemeral() as shared:
+        shared["settings"] = settings
+        if batch_size > 1:
+            for batch in execute_batched_personas.starmap(
+                (chunk, shared) for chunk in _chunked(personas, batch_size)
+            ):
+                yield from batch
+        else:
+            yield from execute_single_persona.starmap(
+                (persona, shared) for persona in personas
+            )
+
+
+async def _load_shared_settings(shared: modal.Dict) -> dict:
+    """Return a run's shared settings, reading the Dict once per container."""
+    settings = _shared_settings.get(shared.object_id)
+    if settings is None:
+        settings = await shared.get.aio("settings")
+        if len(_shared_settings) >= _MAX_CACHED_SETTINGS:
+            _shared_settings.clear()
+        _shared_settings[shared.object_id] = settings
+    return settings
+
+
+def _get_client():
+    """Return the container-wide Anthropic client, creating it on first use."""
+    global _client
+    if _client is None:
+        from anthropic import Anthropic
+
+        _client = Anthropic()
+    return _client
+
+
+def _get_async_client():
+    """Return the container-wide AsyncAnthropic client for persona workers."""
+    global _async_client
+    if _async_client is None:
+        from anthropic import AsyncAnthropic
+
+        _async_client = AsyncAnthropic()
+    return _async_client
+
+
+def _ndjson_line(data: dict) -> bytes:
+    """Serialize a dict as a single NDJSON line (JSON + newline).
+
+    Returns UTF-8 bytes so StreamingResponse can send them without
+    re-encoding.
+    """
+    import orjson
+
+    return orjson.dumps(
+        data,
+        default=str,
+        option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+def _chunked(items: list, size: int):
+    """Yield successive lists of at most ``size`` items."""
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
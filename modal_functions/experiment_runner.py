@@ -4,40 +4,124 @@ This module contains helper functions used by the Modal app.
 The actual Modal function decorators live in app.py.
 """
 
+import asyncio
+import json
 import time
 
+import orjson
 
-def build_persona_system_prompt(persona: dict) -> str:
-    """Build a system prompt that puts Claude into character as a persona.
+from modal_functions.prompt_utils import (
+    EPHEMERAL_CACHE,
+    build_persona_system_prompt,
+    is_cacheable,
+    strip_code_fence,
+)
+
+# Upper bound on max_tokens for one batched (non-streaming) call. The SDK
+# rejects non-streaming requests whose max_tokens could take over 10 minutes
+# (about 21k tokens, less for some models), and the batch worker times out
+# after 5 minutes, so batches are sized to stay well under both.
+MAX_BATCH_OUTPUT_TOKENS = 8_192
+
+_BATCH_INSTRUCTIONS = """You will role-play each of the personas listed by the user.
+Respond to the scenario fully in character for each persona, independently of
+the others. Be specific and authentic to each persona's perspective, experience
+level, and decision-making style. Do not break character or acknowledge that
+you are an AI.
+
+Return ONLY a JSON array with one object per persona:
+{"persona_id": "<the persona's id>", "response": "<the in-character response>"}
+No other text."""
+
+
+def shared_system_blocks(stimulus: str, model: str, batched: bool = False) -> list[dict]:
+    """Build the system blocks every call in an experiment starts with.
+
+    This is the scenario, preceded by the batch instructions for batched
+    calls. The last block is a prompt-caching breakpoint when the prefix is
+    long enough for ``model`` to cache (see is_cacheable); the cache is
+    written once by prime_scenario_cache before the fan-out.
+
+    Args:
+        stimulus: The experiment prompt text.
+        model: Claude model identifier.
+        batched: Whether the prefix is for execute_persona_batch_async.
+
+    Returns:
+        List of system content blocks shared by all calls of the run.
+    """
+    blocks = [{"type": "text", "text": f"Scenario:\n{stimulus}"}]
+    if batched:
+        blocks.insert(0, {"type": "text", "text": _BATCH_INSTRUCTIONS})
+    if is_cacheable("".join(block["text"] for block in blocks), model):
+        blocks[-1]["cache_control"] = EPHEMERAL_CACHE
+    return blocks
+
+
+def build_system_blocks(persona: dict, stimulus: str, model: str) -> list[dict]:
+    """Build the system blocks for a single-persona call.
+
+    The shared scenario prefix comes first so every persona in the
+    experiment can read it from the prompt cache. The persona block follows
+    and is not cached: it differs per persona and per run, so caching it
+    would pay the cache-write premium for a prefix that is never reused. A
+    prompt prebuilt by generate_personas (``_system_prompt``) is used as-is.
 
     Args:
         persona: Persona dict with name, role, background, beliefs, etc.
+        stimulus: The experiment prompt text.
+        model: Claude model identifier.
 
     Returns:
-        System prompt string for the Claude API call.
+        List of system content blocks for the Claude API call.
     """
-    beliefs_text = persona.get("beliefs", "")
-    if isinstance(beliefs_text, list):
-        beliefs_text = "\n".join(f"- {b}" for b in beliefs_text)
+    return [
+        *shared_system_blocks(stimulus, model),
+        {
+            "type": "text",
+            "text": persona.get("_system_prompt") or build_persona_system_prompt(persona),
+        },
+    ]
 
-    return f"""You are {persona['name']}, a {persona['role']}.
 
-Company: {persona.get('company', 'N/A')}
+def prime_scenario_cache(
+    client, stimulus: str, model: str, batched: bool = False
+) -> dict:
+    """Write the experiment's shared prefix to the prompt cache.
 
-Background:
-{persona.get('background', '')}
+    A cache entry is only readable once the call writing it has started
+    responding, so persona calls fanned out together would each pay the
+    cache-write premium and none would read it. Call this once before the
+    fan-out: a one-token reply is enough to write the entry. Does nothing
+    when the prefix is too short to be cached.
 
-Your beliefs and values:
-{beliefs_text}
+    Args:
+        client: Anthropic API client instance.
+        stimulus: The experiment prompt text.
+        model: Claude model identifier.
+        batched: Whether persona calls will be batched.
 
-Decision-making style: {persona.get('decision_style', '')}
+    Returns:
+        Token usage of the priming call (empty if none was made or it
+        failed; priming is only an optimization).
+    """
+    system = shared_system_blocks(stimulus, model, batched)
+    if "cache_control" not in system[-1]:
+        return {}
 
-Respond to the following scenario fully in character. Be specific and authentic
-to your persona's perspective, experience level, and decision-making style.
-Do not break character or acknowledge that you are an AI."""
+    try:
+        response = client.messages.create(
+            model=model,
+            max_tokens=1,
+            system=system,
+            messages=[{"role": "user", "content": "Ready?"}],
+        )
+        return _usage_tokens(response.usage)
+    except Exception:
+        return {}
 
 
-def execute_persona(
+async def execute_persona_async(
     client,
     persona: dict,
     stimulus: str,
@@ -47,8 +131,11 @@ def execute_persona(
 ) -> dict:
     """Execute a single persona's response to the stimulus.
 
+    The reply is streamed so the time to first token can be recorded
+    alongside the total response time.
+
     Args:
-        client: Anthropic API client instance.
+        client: AsyncAnthropic API client instance.
         persona: Persona dict with name, role, background, beliefs, etc.
         stimulus: The experiment prompt text.
         model: Claude model identifier.
@@ -57,53 +144,224 @@ def execute_persona(
 
     Returns:
         Dict with persona_id, response text, sentiment score, token usage,
-        and timing information.
+        and timing information (including ttft_seconds).
     """
     from modal_functions.sentiment import analyze_sentiment
 
     start_time = time.time()
-    system_prompt = build_persona_system_prompt(persona)
+    system_blocks = build_system_blocks(persona, stimulus, model)
 
     try:
-        response = client.messages.create(
+        first_token_time = None
+        async with client.messages.stream(
             model=model,
             max_tokens=max_tokens,
             temperature=temperature,
-            system=system_prompt,
-            messages=[{"role": "user", "content": stimulus}],
-        )
+            system=system_blocks,
+            messages=[
+                {"role": "user", "content": "Please respond to the scenario in character."}
+            ],
+        ) as stream:
+            async for _ in stream.text_stream:
+                if first_token_time is None:
+                    first_token_time = time.time()
+            response = await stream.get_final_message()
 
         response_text = response.content[0].text
         sentiment = analyze_sentiment(response_text)
         elapsed = time.time() - start_time
 
-        return {
-            "persona_id": persona["id"],
-            "persona_name": persona["name"],
-            "archetype_id": persona.get("archetype_id", ""),
-            "archetype_name": persona.get("archetype_name", ""),
-            "response": response_text,
-            "sentiment": sentiment,
-            "tokens": {
-                "input": response.usage.input_tokens,
-                "output": response.usage.output_tokens,
-            },
-            "model": model,
-            "elapsed_seconds": round(elapsed, 2),
-            "error": None,
-        }
+        return _build_result(
+            persona,
+            model=model,
+            elapsed=elapsed,
+            response=response_text,
+            sentiment=sentiment,
+            tokens=_usage_tokens(response.usage),
+            ttft=first_token_time - start_time if first_token_time else None,
+        )
 
     except Exception as e:
         elapsed = time.time() - start_time
-        return {
-            "persona_id": persona["id"],
-            "persona_name": persona["name"],
-            "archetype_id": persona.get("archetype_id", ""),
-            "archetype_name": persona.get("archetype_name", ""),
-            "response": None,
-            "sentiment": 0.0,
-            "tokens": {"input": 0, "output": 0},
-            "model": model,
-            "elapsed_seconds": round(elapsed, 2),
-            "error": f"{type(e).__name__}: {str(e)}",
+        return _build_result(
+            persona,
+            model=model,
+            elapsed=elapsed,
+            error=f"{type(e).__name__}: {str(e)}",
+        )
+
+
+async def execute_persona_batch_async(
+    client,
+    personas: list[dict],
+    stimulus: str,
+    model: str = "claude-sonnet-4-5-20250929",
+    temperature: float = 0.7,
+    max_tokens: int = 500,
+) -> list[dict]:
+    """Execute several personas' responses to the stimulus in one Claude call.
+
+    The scenario is prefilled once for the whole batch and Claude returns a
+    JSON array with one in-character response per persona. Personas missing
+    from the returned array (or all of them, if the call fails, cannot be
+    parsed, or would need more than MAX_BATCH_OUTPUT_TOKENS) are re-run as
+    individual calls issued concurrently.
+
+    Args:
+        client: AsyncAnthropic API client instance.
+        personas: Persona dicts with name, role, background, beliefs, etc.
+        stimulus: The experiment prompt text.
+        model: Claude model identifier.
+        temperature: Sampling temperature.
+        max_tokens: Max response tokens per persona.
+
+    Returns:
+        List of result dicts (same shape as execute_persona_async), one per
+        persona and in the same order as ``personas``.
+    """
+    from modal_functions.sentiment import analyze_sentiment
+
+    start_time = time.time()
+    profiles = [_persona_profile(p) for p in personas]
+
+    try:
+        if max_tokens * len(personas) > MAX_BATCH_OUTPUT_TOKENS:
+            raise ValueError("batch exceeds MAX_BATCH_OUTPUT_TOKENS")
+        response = await client.messages.create(
+            model=model,
+            max_tokens=max_tokens * len(personas),
+            temperature=temperature,
+            system=shared_system_blocks(stimulus, model, batched=True),
+            messages=[
+                {
+                    "role": "user",
+                    "content": f"Personas:\n{json.dumps(profiles, default=str)}",
+                }
+            ],
+        )
+        tokens_per_persona = _split_tokens(_usage_tokens(response.usage), len(personas))
+        text = strip_code_fence(response.content[0].text.strip())
+    except Exception:
+        # No usable reply (failed call, empty or non-text content): every
+        # persona is re-run on its own below
+        tokens_per_persona = [{} for _ in personas]
+        text = ""
+
+    elapsed = time.time() - start_time
+    try:
+        responses = {
+            str(item.get("persona_id")): item.get("response")
+            for item in orjson.loads(text)
+            if isinstance(item, dict)
         }
+    except (ValueError, TypeError):
+        responses = {}
+
+    results: list[dict | None] = []
+    missing = []
+    for i, (persona, tokens) in enumerate(zip(personas, tokens_per_persona)):
+        response_text = responses.get(persona["id"])
+        if isinstance(response_text, str) and response_text.strip():
+            results.append(_build_result(
+                persona,
+                model=model,
+                elapsed=elapsed,
+                response=response_text,
+                sentiment=analyze_sentiment(response_text),
+                tokens=tokens,
+            ))
+        else:
+            results.append(None)
+            missing.append(i)
+
+    if missing:
+        retried = await asyncio.gather(*(
+            execute_persona_async(
+                client=client,
+                persona=personas[i],
+                stimulus=stimulus,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+            for i in missing
+        ))
+        for i, result in zip(missing, retried):
+            # Keep this persona's share of the batch call in its token count
+            for key, value in tokens_per_persona[i].items():
+                result["tokens"][key] = result["tokens"].get(key, 0) + value
+            results[i] = result
+
+    return results
+
+
+def _persona_profile(persona: dict) -> dict:
+    """Return the persona fields Claude needs to answer in character."""
+    return {
+        "persona_id": persona["id"],
+        "name": persona["name"],
+        "role": persona["role"],
+        "company": persona.get("company", "N/A"),
+        "background": persona.get("background", ""),
+        "beliefs": persona.get("beliefs", ""),
+        "decision_style": persona.get("decision_style", ""),
+    }
+
+
+def _usage_tokens(usage) -> dict:
+    """Convert an Anthropic usage object into the result ``tokens`` dict.
+
+    Cached prefix tokens are reported separately from input_tokens; fold them
+    back in so "input" stays the full prompt size.
+    """
+    cache_read = usage.cache_read_input_tokens or 0
+    cache_write = usage.cache_creation_input_tokens or 0
+    return {
+        "input": usage.input_tokens + cache_read + cache_write,
+        "output": usage.output_tokens,
+        "cached": cache_read,
+    }
+
+
+def _split_tokens(tokens: dict, n: int) -> list[dict]:
+    """Apportion a batch's token usage evenly across ``n`` personas.
+
+    Remainders go to the first personas so the per-persona counts still sum
+    to the batch totals.
+    """
+    shares = [{} for _ in range(n)]
+    for key, total in tokens.items():
+        base, extra = divmod(total, n)
+        for i, share in enumerate(shares):
+            share[key] = base + (1 if i < extra else 0)
+    return shares
+
+
+def _build_result(
+    persona: dict,
+    model: str,
+    elapsed: float,
+    response: str | None = None,
+    sentiment: float = 0.0,
+    tokens: dict | None = None,
+    error: str | None = None,
+    ttft: float | None = None,
+) -> dict:
+    """Build the result dict returned for a single persona.
+
+    ``ttft`` (time to first token) is only known for streamed single-persona
+    calls; it is None for batched and failed calls.
+    """
+    return {
+        "persona_id": persona["id"],
+        "persona_name": persona["name"],
+        "archetype_id": persona.get("archetype_id", ""),
+        "archetype_name": persona.get("archetype_name", ""),
+        "response": response,
+        "sentiment": sentiment,
+        "tokens": tokens or {"input": 0, "output": 0, "cached": 0},
+        "model": model,
+        "elapsed_seconds": round(elapsed, 2),
+        "ttft_seconds": round(ttft, 2) if ttft is not None else None,
+        "error": error,
+    }
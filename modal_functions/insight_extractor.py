@@ -6,8 +6,13 @@ structured insights: themes, recommendations, concerns, and archetype patterns.
 This is a pure Python helper module -- no Modal decorators.
 """
 
+import io
 import json
 
+import orjson
+
+from modal_functions.prompt_utils import strip_code_fence
+
 
 def extract_insights(
     client,
@@ -29,15 +34,25 @@ def extract_insights(
     if not successful:
         return _empty_insights()
 
-    # Build a condensed summary of all responses for Claude
-    responses_summary = []
-    for r in successful:
-        responses_summary.append({
-            "persona": r.get("persona_name", "Unknown"),
-            "archetype": r.get("archetype_name", "Unknown"),
-            "sentiment": r.get("sentiment", 0.0),
-            "response": r.get("response", "")[:1000],  # Truncate long responses
-        })
+    # Build a condensed JSON summary of all responses for Claude, one row at
+    # a time, so no intermediate list has to be serialized as a second copy.
+    # No indentation: it only inflates the prompt's token count.
+    buf = io.StringIO()
+    buf.write("[\n")
+    for i, r in enumerate(successful):
+        if i:
+            buf.write(",\n")
+        json.dump(
+            {
+                "persona": r.get("persona_name", "Unknown"),
+                "archetype": r.get("archetype_name", "Unknown"),
+                "sentiment": r.get("sentiment", 0.0),
+                "response": r.get("response", "")[:1000],  # Truncate long responses
+            },
+            buf,
+            default=str,
+        )
+    buf.write("\n]")
 
     stimulus = body.get("stimulus", {}).get("template", "")
 
@@ -49,7 +64,7 @@ def extract_insights(
 
 Here are all persona responses:
 
-{json.dumps(responses_summary, indent=2, default=str)}
+{buf.getvalue()}
 
 Extract the following structured insights as JSON:
 
@@ -78,24 +93,10 @@ Return ONLY valid JSON with these four top-level keys. No markdown, no explanati
             messages=[{"role": "user", "content": prompt}],
         )
 
-        text = response.content[0].text.strip()
-
         # Strip markdown code fences if present
-        if text.startswith("```"):
-            lines = text.split("\n")
-            json_lines = []
-            in_block = False
-            for line in lines:
-                if line.startswith("```") and not in_block:
-                    in_block = True
-                    continue
-                elif line.startswith("```") and in_block:
-                    break
-                elif in_block:
-                    json_lines.append(line)
-            text = "\n".join(json_lines)
-
-        insights = json.loads(text)
+        text = strip_code_fence(response.content[0].text.strip())
+
+        insights = orjson.loads(text)
 
         # Ensure expected keys exist
         insights.setdefault("themes", [])
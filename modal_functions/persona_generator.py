@@ -5,10 +5,20 @@ with distinct names, backgrounds, beliefs, and decision-making styles.
 """
 
 import json
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
+import orjson
 from anthropic import Anthropic
 
+from modal_functions.prompt_utils import (
+    EPHEMERAL_CACHE,
+    build_persona_system_prompt,
+    is_cacheable,
+    strip_code_fence,
+)
+
 
 def generate_personas(
     client: Anthropic,
@@ -28,32 +38,81 @@ def generate_personas(
 
     Returns:
         List of persona dicts, each with id, name, role, archetype_id,
-        archetype_name, background, beliefs, and decision_style.
+        archetype_name, background, beliefs, and decision_style, plus the
+        prebuilt _system_prompt used when executing the persona.
     """
-    all_personas = []
-
-    for archetype in archetypes:
-        count = archetype.get("count", 1)
-        archetype_id = archetype.get("id", "unknown")
-        archetype_name = archetype.get("name", archetype_id)
-        description = archetype.get("description", "")
-        characteristics = archetype.get("characteristics", [])
-
-        context_section = ""
-        if context and context.get("files"):
-            context_section = f"\nRelevant context data:\n{json.dumps(context['files'], indent=2, default=str)}"
-
-        characteristics_text = ""
-        if characteristics:
-            characteristics_text = "\nKey characteristics:\n" + "\n".join(
-                f"- {c}" for c in characteristics
+    if not archetypes:
+        return []
+
+    # Serialize the (potentially large) context once for all archetypes
+    context_section = ""
+    if context and context.get("files"):
+        context_section = (
+            f"Relevant context data:\n{json.dumps(context['files'], default=str)}"
+        )
+
+    cache_context = len(archetypes) > 1 and is_cacheable(context_section, model)
+
+    # Archetypes are independent Claude calls: issue them concurrently so the
+    # total wait is the slowest archetype rather than the sum of all of them.
+    # A cached prefix is only readable once the call writing it has started
+    # responding, so when the context is cached the first archetype is sent
+    # alone and the rest follow as soon as its reply begins streaming.
+    started = threading.Event() if cache_context else None
+    with ThreadPoolExecutor(max_workers=min(8, len(archetypes))) as executor:
+        first = executor.submit(
+            _generate_for_archetype,
+            client, archetypes[0], context_section, model, cache_context, started,
+        )
+        if started is not None:
+            started.wait()
+        rest = [
+            executor.submit(
+                _generate_for_archetype,
+                client, archetype, context_section, model, cache_context,
             )
+            for archetype in archetypes[1:]
+        ]
+
+        all_personas = []
+        for future in (first, *rest):
+            all_personas.extend(future.result())
 
-        prompt = f"""Generate {count} unique, realistic personas for the archetype "{archetype_name}".
+    return all_personas
+
+
+def _generate_for_archetype(
+    client: Anthropic,
+    archetype: dict,
+    context_section: str,
+    model: str,
+    cache_context: bool = False,
+    started: threading.Event | None = None,
+) -> list[dict]:
+    """Generate the personas for a single archetype with one Claude call.
+
+    ``context_section`` is the pre-serialized context shared by every
+    archetype, sent as its own leading content block. With ``cache_context``
+    the block is marked for prompt caching, so the shared prefix is prefilled
+    once rather than per archetype. When ``started`` is given, the reply is
+    streamed and the event is set as soon as it begins (or the call fails).
+    """
+    count = archetype.get("count", 1)
+    archetype_id = archetype.get("id", "unknown")
+    archetype_name = archetype.get("name", archetype_id)
+    description = archetype.get("description", "")
+    characteristics = archetype.get("characteristics", [])
+
+    characteristics_text = ""
+    if characteristics:
+        characteristics_text = "\nKey characteristics:\n" + "\n".join(
+            f"- {c}" for c in characteristics
+        )
+
+    prompt = f"""Generate {count} unique, realistic personas for the archetype "{archetype_name}".
 
 Archetype description: {description}
 {characteristics_text}
-{context_section}
 
 For each persona, provide a JSON object with these fields:
 - "name": A realistic full name (diverse names from different backgrounds)
@@ -65,59 +124,64 @@ For each persona, provide a JSON object with these fields:
 
 Return ONLY a JSON array of {count} persona objects. No other text."""
 
-        response = client.messages.create(
-            model=model,
-            max_tokens=4096,
-            temperature=0.9,
-            messages=[{"role": "user", "content": prompt}],
-        )
-
-        response_text = response.content[0].text.strip()
-
-        # Parse JSON from the response, handling markdown code blocks
-        if response_text.startswith("```"):
-            # Extract JSON from markdown code block
-            lines = response_text.split("\n")
-            json_lines = []
-            in_block = False
-            for line in lines:
-                if line.startswith("```") and not in_block:
-                    in_block = True
-                    continue
-                elif line.startswith("```") and in_block:
-                    break
-                elif in_block:
-                    json_lines.append(line)
-            response_text = "\n".join(json_lines)
-
+    content: str | list[dict] = prompt
+    if context_section:
+        context_block = {"type": "text", "text": context_section}
+        if cache_context:
+            context_block["cache_control"] = EPHEMERAL_CACHE
+        content = [context_block, {"type": "text", "text": prompt}]
+
+    request = {
+        "model": model,
+        "max_tokens": 4096,
+        "temperature": 0.9,
+        "messages": [{"role": "user", "content": content}],
+    }
+    if started is None:
+        response = client.messages.create(**request)
+    else:
         try:
-            personas_data = json.loads(response_text)
-        except json.JSONDecodeError:
-            # Fallback: create a basic persona if parsing fails
-            personas_data = [
-                {
-                    "name": f"{archetype_name} #{i + 1}",
-                    "role": archetype_name,
-                    "company": "Unknown",
-                    "background": description or f"A {archetype_name}.",
-                    "beliefs": "Makes data-driven decisions.",
-                    "decision_style": "Analytical and thorough.",
-                }
-                for i in range(count)
-            ]
-
-        for i, persona_data in enumerate(personas_data[:count]):
-            persona = {
-                "id": f"{archetype_id}-{uuid.uuid4().hex[:8]}",
-                "name": persona_data.get("name", f"{archetype_name} #{i + 1}"),
-                "role": persona_data.get("role", archetype_name),
-                "archetype_id": archetype_id,
-                "archetype_name": archetype_name,
-                "company": persona_data.get("company", ""),
-                "background": persona_data.get("background", ""),
-                "beliefs": persona_data.get("beliefs", ""),
-                "decision_style": persona_data.get("decision_style", ""),
+            with client.messages.stream(**request) as stream:
+                for event in stream:
+                    if event.type == "message_start":
+                        started.set()
+                response = stream.get_final_message()
+        finally:
+            started.set()
+
+    # Parse JSON from the response, handling markdown code blocks
+    response_text = strip_code_fence(response.content[0].text.strip())
+
+    try:
+        personas_data = orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        # Fallback: create a basic persona if parsing fails
+        personas_data = [
+            {
+                "name": f"{archetype_name} #{i + 1}",
+                "role": archetype_name,
+                "company": "Unknown",
+                "background": description or f"A {archetype_name}.",
+                "beliefs": "Makes data-driven decisions.",
+                "decision_style": "Analytical and thorough.",
             }
-            all_personas.append(persona)
-
-    return all_personas
+            for i in range(count)
+        ]
+
+    personas = []
+    for i, persona_data in enumerate(personas_data[:count]):
+        persona = {
+            "id": f"{archetype_id}-{uuid.uuid4().hex[:8]}",
+            "name": persona_data.get("name", f"{archetype_name} #{i + 1}"),
+            "role": persona_data.get("role", archetype_name),
+            "archetype_id": archetype_id,
+            "archetype_name": archetype_name,
+            "company": persona_data.get("company", ""),
+            "background": persona_data.get("background", ""),
+            "beliefs": persona_data.get("beliefs", ""),
+            "decision_style": persona_data.get("decision_style", ""),
+        }
+        persona["_system_prompt"] = build_persona_system_prompt(persona)
+        personas.append(persona)
+
+    return personas
@@ -0,0 +1,83 @@
+"""Prompt-building, prompt-caching and reply-parsing helpers shared by the
+persona generator, persona execution and insight extraction modules.
+
+This is a pure Python helper module -- no Modal decorators.
+"""
+
+import re
+
+# Marks a content block as a prompt-caching breakpoint (Anthropic caches the
+# prefix up to and including the block for ~5 minutes).
+EPHEMERAL_CACHE = {"type": "ephemeral"}
+
+# Minimum prompt-prefix length Anthropic will cache, in tokens: 4096 for the
+# Haiku models we use, 1024 for Sonnet. Shorter prefixes are never cached,
+# so marking them only adds a cache write attempt.
+_MIN_CACHEABLE_TOKENS = {"haiku": 4096}
+_DEFAULT_MIN_CACHEABLE_TOKENS = 1024
+
+# Characters-per-token estimate, on the high side for prose and JSON so a
+# prefix is only treated as cacheable when it clearly is.
+_CHARS_PER_TOKEN = 4
+
+# Matches a response wrapped in a markdown code fence (```json ... ```):
+# an opening fence with an optional language tag, then group 1, the body up to
+# the first closing fence (None if empty), and anything after that fence.
+_FENCE_RE = re.compile(r"```[^\n]*(?:\n(.*?))??(?:\n```.*)?", re.DOTALL)
+
+
+def is_cacheable(prefix: str, model: str) -> bool:
+    """Return whether a prompt prefix is long enough for ``model`` to cache.
+
+    Marking a prefix only pays off if it is cacheable and then read back. A
+    cache entry becomes readable once the call that writes it has started
+    responding, so callers also send one call first and fan out the rest
+    after it has started.
+    """
+    min_tokens = next(
+        (tokens for family, tokens in _MIN_CACHEABLE_TOKENS.items() if family in model),
+        _DEFAULT_MIN_CACHEABLE_TOKENS,
+    )
+    return len(prefix) >= min_tokens * _CHARS_PER_TOKEN
+
+
+def strip_code_fence(text: str) -> str:
+    """Return the body of a reply wrapped in a markdown code fence.
+
+    Text that does not start with a fence is returned unchanged. Callers are
+    expected to strip surrounding whitespace first.
+    """
+    match = _FENCE_RE.fullmatch(text)
+    if match:
+        return match.group(1) or ""
+    return text
+
+
+def build_persona_system_prompt(persona: dict) -> str:
+    """Build a system prompt that puts Claude into character as a persona.
+
+    Args:
+        persona: Persona dict with name, role, background, beliefs, etc.
+
+    Returns:
+        System prompt string for the Claude API call.
+    """
+    beliefs_text = persona.get("beliefs", "")
+    if isinstance(beliefs_text, list):
+        beliefs_text = "\n".join(f"- {b}" for b in beliefs_text)
+
+    return f"""You are {persona['name']}, a {persona['role']}.
+
+Company: {persona.get('company', 'N/A')}
+
+Background:
+{persona.get('background', '')}
+
+Your beliefs and values:
+{beliefs_text}
+
+Decision-making style: {persona.get('decision_style', '')}
+
+Respond to the scenario above fully in character. Be specific and authentic
+to your persona's perspective, experience level, and decision-making style.
+Do not break character or acknowledge that you are an AI."""
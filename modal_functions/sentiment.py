@@ -4,7 +4,7 @@ Uses a lightweight keyword + heuristic approach for fast sentiment scoring.
 Falls back to Claude for ambiguous cases when needed.
 """
 
-import re
+import ahocorasick
 
 # Positive and negative signal words with weights
 _POSITIVE_SIGNALS = {
@@ -37,6 +37,43 @@ _NEGATIVE_SIGNALS = {
     "confused": 1, "frustrated": 1, "disappointed": 1,
 }
 
+# Merged lexicon: word -> signed weight (negative for negative signals).
+# No word appears in both lists, so one lookup scores any match.
+_SIGNALS = {word: weight for word, weight in _POSITIVE_SIGNALS.items()}
+_SIGNALS.update({word: -weight for word, weight in _NEGATIVE_SIGNALS.items()})
+
+
+# Aho-Corasick automaton over the same lexicon: a single C-level pass finds
+# every occurrence regardless of lexicon size. Values carry the word length
+# so matches can be checked against word boundaries.
+_AUTOMATON = ahocorasick.Automaton()
+for _word, _weight in _SIGNALS.items():
+    _AUTOMATON.add_word(_word, (len(_word), _weight))
+_AUTOMATON.make_automaton()
+
+
+def _automaton_signals(text: str) -> list[int]:
+    """Return the signed weight of each whole-word signal match in ``text``.
+
+    A match counts only if the characters around it are not word characters
+    (alphanumerics and "_"), i.e. it starts and ends on a word boundary. The
+    test is inlined since it runs for every raw match.
+    """
+    last = len(text) - 1
+    weights = []
+    for end, (length, weight) in _AUTOMATON.iter(text):
+        start = end - length + 1
+        if start > 0:
+            char = text[start - 1]
+            if char.isalnum() or char == "_":
+                continue
+        if end < last:
+            char = text[end + 1]
+            if char.isalnum() or char == "_":
+                continue
+        weights.append(weight)
+    return weights
+
 
 def analyze_sentiment(text: str) -> float:
     """Analyze the sentiment of a response text.
@@ -44,26 +81,20 @@ def analyze_sentiment(text: str) -> float:
     Returns a score from -1.0 (very negative) to 1.0 (very positive).
     0.0 indicates neutral sentiment.
     """
-    if not text or not text.strip():
+    # isspace() checks in place; strip() would copy the whole response
+    if not text or text.isspace():
         return 0.0
 
-    words = re.findall(r"\b[a-z]+\b", text.lower())
-
-    positive_score = 0
-    negative_score = 0
-
-    for word in words:
-        if word in _POSITIVE_SIGNALS:
-            positive_score += _POSITIVE_SIGNALS[word]
-        if word in _NEGATIVE_SIGNALS:
-            negative_score += _NEGATIVE_SIGNALS[word]
+    weights = _automaton_signals(text.lower())
 
-    total = positive_score + negative_score
+    # Accumulate in C rather than in a Python-level loop
+    signed_score = sum(weights)
+    total = sum(map(abs, weights))
     if total == 0:
         return 0.0
 
     # Normalize to [-1, 1] range
-    raw_score = (positive_score - negative_score) / total
+    raw_score = signed_score / total
 
     # Clamp to [-1, 1]
     return max(-1.0, min(1.0, round(raw_score, 2)))
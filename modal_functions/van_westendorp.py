@@ -11,9 +11,33 @@ This is a pure Python helper module -- no Modal decorators.
 """
 
 import re
+from collections import defaultdict
+from operator import itemgetter
 
+import numpy as np
 
-def calculate_van_westendorp(results: list[dict]) -> dict:
+_PRICE_KEYS = ("too_expensive", "expensive", "bargain", "too_cheap")
+
+# Pulls the four answers out of a price-point dict as a tuple, in key order
+_price_row = itemgetter(*_PRICE_KEYS)
+
+# All four price-point lines in one pattern, so a response is scanned once.
+# Each alternative names its amount group after its key (commas allowed).
+# Quantifiers are possessive: nothing after them can match what they consume,
+# so giving characters back never helps, and a near-miss such as a keyword
+# followed by a long run of spaces fails without backtracking.
+_PRICE_RE = re.compile(
+    r"TOO[_\s]EXPENSIVE\s*+:\s*+\$?\s*+(?P<too_expensive>[\d,]++(?:\.\d{1,2})?)"
+    r"|(?<!TOO[_\s])EXPENSIVE\s*+:\s*+\$?\s*+(?P<expensive>[\d,]++(?:\.\d{1,2})?)"
+    r"|BARGAIN\s*+:\s*+\$?\s*+(?P<bargain>[\d,]++(?:\.\d{1,2})?)"
+    r"|TOO[_\s]CHEAP\s*+:\s*+\$?\s*+(?P<too_cheap>[\d,]++(?:\.\d{1,2})?)",
+    re.IGNORECASE,
+)
+
+
+def calculate_van_westendorp(
+    results: list[dict], include_cumulative_data: bool = False
+) -> dict:
     """Calculate Van Westendorp Price Sensitivity Meter from persona responses.
 
     Expects persona responses to contain structured price lines like:
@@ -24,15 +48,19 @@ def calculate_van_westendorp(results: list[dict]) -> dict:
 
     Args:
         results: List of persona result dicts from experiment execution.
+        include_cumulative_data: Whether to return the per-price cumulative
+            curves (needed to plot them). Left empty when False.
 
     Returns:
         Dict with intersection points, acceptable price range,
         cumulative distribution data, and per-archetype breakdowns.
         Returns None-filled result if fewer than 2 valid data points.
     """
-    # Parse price points from all successful responses
-    all_prices = []
-    by_archetype: dict[str, list[dict]] = {}
+    # Parse price points from all successful responses into one row per
+    # response (columns in _PRICE_KEYS order) plus an archetype id
+    rows = []
+    archetype_ids = []
+    archetype_index: dict[str, int] = defaultdict(lambda: len(archetype_index))
 
     for r in results:
         if r.get("error") is not None:
@@ -40,39 +68,57 @@ def calculate_van_westendorp(results: list[dict]) -> dict:
 
         response_text = r.get("response", "")
         prices = _parse_price_points(response_text)
-
         if prices is None:
             continue
 
         archetype = r.get("archetype_name", "unknown")
-        all_prices.append(prices)
-
-        if archetype not in by_archetype:
-            by_archetype[archetype] = []
-        by_archetype[archetype].append(prices)
+        rows.append(_price_row(prices))
+        archetype_ids.append(archetype_index[archetype])
 
-    if len(all_prices) < 2:
+    if len(rows) < 2:
         return _empty_result()
 
+    # One row per question, one column per response
+    answers = np.array(rows, dtype=np.float64).T
+    ids = np.array(archetype_ids)
+
     # Calculate overall intersections
-    overall = _calculate_intersections(all_prices)
+    overall = _calculate_intersections(
+        np.sort(answers, axis=1), include_cumulative_data
+    )
 
     # Calculate per-archetype intersections
     archetype_results = {}
-    for arch, arch_prices in by_archetype.items():
-        if len(arch_prices) >= 2:
-            arch_intersections = _calculate_intersections(arch_prices)
-            archetype_results[arch] = {
-                "opp": arch_intersections["optimal_price_point"],
-                "ipp": arch_intersections["indifference_price_point"],
-                "pmc": arch_intersections["point_of_marginal_cheapness"],
-                "pme": arch_intersections["point_of_marginal_expensiveness"],
-            }
+    counts = np.bincount(ids)
+    if len(counts) == 1:
+        # Every response shares one archetype, so its curves are the overall ones
+        archetype_results[next(iter(archetype_index))] = _archetype_summary(overall)
+    elif counts.max() >= 2:
+        # Sort each question's answers by (archetype, value) in one pass, so
+        # every archetype's answers are a contiguous, already-sorted column range
+        grouped = np.stack([row[np.lexsort((row, ids))] for row in answers])
+        bounds = np.cumsum(counts).tolist()
+
+        for arch, start, stop in zip(archetype_index, [0, *bounds], bounds):
+            if stop - start >= 2:
+                archetype_results[arch] = _archetype_summary(
+                    _calculate_intersections(grouped[:, start:stop])
+                )
 
     overall["by_archetype"] = archetype_results
     return overall
 
 
+def _archetype_summary(intersections: dict) -> dict:
+    """Return the short-keyed intersection points reported per archetype."""
+    return {
+        "opp": intersections["optimal_price_point"],
+        "ipp": intersections["indifference_price_point"],
+        "pmc": intersections["point_of_marginal_cheapness"],
+        "pme": intersections["point_of_marginal_expensiveness"],
+    }
+
+
 def _parse_price_points(text: str) -> dict | None:
     """Extract 4 price points from a persona response.
 
@@ -88,68 +134,73 @@ def _parse_price_points(text: str) -> dict | None:
     if not text:
         return None
 
-    patterns = {
-        "too_expensive": r"TOO[_\s]EXPENSIVE\s*:\s*\$?\s*([\d,]+(?:\.\d{1,2})?)",
-        "expensive": r"(?<!TOO[_\s])EXPENSIVE\s*:\s*\$?\s*([\d,]+(?:\.\d{1,2})?)",
-        "bargain": r"BARGAIN\s*:\s*\$?\s*([\d,]+(?:\.\d{1,2})?)",
-        "too_cheap": r"TOO[_\s]CHEAP\s*:\s*\$?\s*([\d,]+(?:\.\d{1,2})?)",
-    }
-
+    # The first line found for each key wins
     prices = {}
-    for key, pattern in patterns.items():
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            value_str = match.group(1).replace(",", "")
-            try:
-                prices[key] = float(value_str)
-            except ValueError:
-                return None
-        else:
+    for match in _PRICE_RE.finditer(text):
+        key = match.lastgroup
+        if key in prices:
+            continue
+        value_str = match.group(key)
+        if "," in value_str:
+            value_str = value_str.replace(",", "")
+        try:
+            prices[key] = float(value_str)
+        except ValueError:
             return None
+        if len(prices) == 4:
+            break
+    else:
+        return None
 
-    # Sanity check: too_cheap <= bargain <= expensive <= too_expensive
-    if not (prices["too_cheap"] <= prices["bargain"] <= prices["expensive"] <= prices["too_expensive"]):
-        # Try to use the values anyway -- personas may not be perfectly ordered
-        pass
-
+    # Values are used even if not ordered too_cheap <= bargain <= expensive
+    # <= too_expensive -- personas may not be perfectly ordered
     return prices
 
 
-def _calculate_intersections(price_data: list[dict]) -> dict:
+def _calculate_intersections(
+    answers: np.ndarray, include_cumulative_data: bool = False
+) -> dict:
     """Calculate Van Westendorp intersection points from parsed price data.
 
     Uses cumulative distributions of the four price questions and finds
     where the curves intersect.
 
+    Args:
+        answers: Array of shape (4, n), one row per question in _PRICE_KEYS
+            order, each row sorted ascending.
+        include_cumulative_data: Whether to build cumulative_data rows.
+
     Returns dict with optimal_price_point, indifference_price_point,
     point_of_marginal_cheapness, point_of_marginal_expensiveness,
     acceptable_price_range, and cumulative_data.
     """
-    # Collect all unique price values to build the x-axis
-    all_values: set[float] = set()
-    for p in price_data:
-        all_values.update(p.values())
+    te, ex, bg, tc = answers
+    n = answers.shape[1]
 
-    price_points = sorted(all_values)
-    n = len(price_data)
+    # All unique price values, sorted, form the x-axis
+    pp = np.unique(answers)
 
     # Build cumulative distributions
     # For each price on the x-axis, calculate the proportion of respondents
-    # who gave a value <= that price for each question.
-    cumulative = []
-    for price in price_points:
-        too_cheap_cum = sum(1 for p in price_data if p["too_cheap"] >= price) / n
-        bargain_cum = sum(1 for p in price_data if p["bargain"] >= price) / n
-        expensive_cum = sum(1 for p in price_data if p["expensive"] <= price) / n
-        too_expensive_cum = sum(1 for p in price_data if p["too_expensive"] <= price) / n
-
-        cumulative.append({
-            "price": price,
-            "too_cheap": round(too_cheap_cum, 4),
-            "bargain": round(bargain_cum, 4),
-            "expensive": round(expensive_cum, 4),
-            "too_expensive": round(too_expensive_cum, 4),
-        })
+    # who gave a value >= (cheap curves) or <= (expensive curves) that price.
+    # With each answer row sorted, a binary search gives those counts
+    # directly instead of comparing every price against every respondent.
+    too_cheap_cum = (n - np.searchsorted(tc, pp, side="left")) / n
+    bargain_cum = (n - np.searchsorted(bg, pp, side="left")) / n
+    expensive_cum = np.searchsorted(ex, pp, side="right") / n
+    too_expensive_cum = np.searchsorted(te, pp, side="right") / n
+
+    # Curves are kept as parallel arrays (one per question, aligned with the
+    # x-axis); the per-row dicts are only built for the returned payload.
+    cumulative = {
+        "price": pp,
+        "too_cheap": too_cheap_cum,
+        "bargain": bargain_cum,
+        "expensive": expensive_cum,
+        "too_expensive": too_expensive_cum,
+    }
+    for cum in (too_cheap_cum, bargain_cum, expensive_cum, too_expensive_cum):
+        np.round(cum, 4, out=cum)
 
     # Find intersections by linear interpolation between adjacent points
     opp = _find_intersection(cumulative, "too_expensive", "too_cheap")
@@ -158,8 +209,9 @@ def _calculate_intersections(price_data: list[dict]) -> dict:
     pme = _find_intersection(cumulative, "too_expensive", "bargain")
 
     # Acceptable price range: between PMC and PME
-    low = pmc if pmc is not None else price_points[0]
-    high = pme if pme is not None else price_points[-1]
+    # (intersections are already rounded; only the fallbacks need it)
+    low = pmc if pmc is not None else round(pp[0].item(), 2)
+    high = pme if pme is not None else round(pp[-1].item(), 2)
 
     return {
         "optimal_price_point": opp,
@@ -167,15 +219,24 @@ def _calculate_intersections(price_data: list[dict]) -> dict:
         "point_of_marginal_cheapness": pmc,
         "point_of_marginal_expensiveness": pme,
         "acceptable_price_range": {
-            "low": round(low, 2),
-            "high": round(high, 2),
+            "low": low,
+            "high": high,
         },
-        "cumulative_data": cumulative,
+        "cumulative_data": _cumulative_rows(cumulative) if include_cumulative_data else [],
     }
 
 
+def _cumulative_rows(cumulative: dict[str, np.ndarray]) -> list[dict]:
+    """Convert the cumulative curve arrays into one dict per x-axis price."""
+    keys = tuple(cumulative)
+    return [
+        dict(zip(keys, row))
+        for row in zip(*(cumulative[key].tolist() for key in keys))
+    ]
+
+
 def _find_intersection(
-    cumulative: list[dict],
+    cumulative: dict[str, np.ndarray],
     curve_a: str,
     curve_b: str,
 ) -> float | None:
@@ -186,36 +247,57 @@ def _find_intersection(
 
     Returns the interpolated price or None if no intersection found.
     """
-    for i in range(len(cumulative) - 1):
-        a1 = cumulative[i][curve_a]
-        b1 = cumulative[i][curve_b]
-        a2 = cumulative[i + 1][curve_a]
-        b2 = cumulative[i + 1][curve_b]
-
-        diff1 = a1 - b1
-        diff2 = a2 - b2
-
-        # Check for sign change (intersection between these two points)
-        if diff1 * diff2 < 0:
-            # Linear interpolation
-            p1 = cumulative[i]["price"]
-            p2 = cumulative[i + 1]["price"]
-            # Solve: a1 + t*(a2-a1) = b1 + t*(b2-b1) for t
-            denom = (a2 - a1) - (b2 - b1)
-            if abs(denom) < 1e-10:
-                return round((p1 + p2) / 2, 2)
-            t = (b1 - a1) / denom
-            return round(p1 + t * (p2 - p1), 2)
-
-        # Exact intersection at a data point
-        if abs(diff1) < 1e-10:
-            return round(cumulative[i]["price"], 2)
-
-    # Check last point
-    if cumulative and abs(cumulative[-1][curve_a] - cumulative[-1][curve_b]) < 1e-10:
-        return round(cumulative[-1]["price"], 2)
-
-    return None
+    a = cumulative[curve_a]
+    b = cumulative[curve_b]
+    price = cumulative["price"]
+
+    hit = _first_crossing(a - b)
+    if hit is None:
+        return None
+
+    i, is_sign_change = hit
+    if is_sign_change:
+        segment = slice(i, i + 2)
+        return _interpolate(*a[segment].tolist(), *b[segment].tolist(), *price[segment].tolist())
+
+    # Exact intersection at a data point
+    return round(price[i].item(), 2)
+
+
+def _first_crossing(diff: np.ndarray) -> tuple[int, bool] | None:
+    """Locate where a curve difference first crosses zero.
+
+    Scanning left to right, a crossing is either a segment whose endpoints
+    have different sign bits or a point within 1e-10 of zero; on the same
+    index the sign change wins. A segment that merely ends on zero counts as
+    a sign change, which is harmless: interpolating it lands on that zero.
+
+    Returns (index, is_sign_change), or None if the curves never meet.
+    """
+    exact = np.abs(diff) < 1e-10
+    signs = np.signbit(diff)
+    sign_changes = signs[:-1] ^ signs[1:]
+    hits = np.flatnonzero(sign_changes | exact[:-1])
+    if hits.size:
+        i = int(hits[0])
+        return i, bool(sign_changes[i])
+    return (len(diff) - 1, False) if exact[-1] else None
+
+
+def _interpolate(
+    a1: float, a2: float, b1: float, b2: float, p1: float, p2: float
+) -> float:
+    """Return the price where two curves cross within one x-axis segment.
+
+    Takes plain floats for both curves and the prices at the segment ends.
+    """
+    # Linear interpolation
+    # Solve: a1 + t*(a2-a1) = b1 + t*(b2-b1) for t
+    denom = (a2 - a1) - (b2 - b1)
+    if abs(denom) < 1e-10:
+        return round((p1 + p2) / 2, 2)
+    t = (b1 - a1) / denom
+    return round(p1 + t * (p2 - p1), 2)
 
 
 def _empty_result() -> dict:
@@ -143,6 +143,7 @@ function makeConfig(overrides?: Record<string, unknown>) {
       maxTokens: 500,
       timeout: 60,
       parallelization: true,
+      batchSize: 4,
     },
     analysis: {
       metrics: [{ id: 'avg_sentiment', type: 'average' }],
@@ -211,16 +212,6 @@ function setupHappyPath() {
       })
       await onEvent({
         type: 'experiment_complete',
-        results: [
-          {
-            persona_id: 'p1',
-            persona_name: 'Alice VC',
-            archetype_id: 'vc_partner',
-            archetype_name: 'vc_partner',
-            response: 'I would invest.',
-            sentiment: 0.9,
-          },
-        ],
         metrics: { avg_sentiment: 0.9 },
       })
     }
@@ -339,6 +330,7 @@ describe('executeExperiment', () => {
         },
         expect.any(Function)
       )
+      expect(mockRunExperiment.mock.calls[0]![0].execution.batchSize).toBe(4)
     })
 
     it('processes status stream events and emits running status', async () => {
@@ -617,9 +609,9 @@ describe('executeExperiment', () => {
       )
     })
 
-    it('replaces allResults with experiment_complete results', async () => {
+    it('keeps streamed results when experiment_complete arrives', async () => {
       setupHappyPath()
-      const finalResults = [
+      const streamedResults = [
         {
           persona_id: 'p1',
           persona_name: 'Alice VC',
@@ -641,18 +633,11 @@ describe('executeExperiment', () => {
 
       mockRunExperiment.mockImplementation(
         async (_request: unknown, onEvent: (event: unknown) => Promise<void>) => {
-          await onEvent({
-            type: 'response_complete',
-            persona_id: 'p1',
-            persona_name: 'Alice VC',
-            archetype_id: 'vc_partner',
-            archetype_name: 'vc_partner',
-            response: 'Interim response',
-            sentiment: 0.8,
-          })
+          for (const result of streamedResults) {
+            await onEvent({ type: 'response_complete', ...result })
+          }
           await onEvent({
             type: 'experiment_complete',
-            results: finalResults,
             metrics: finalMetrics,
           })
         }
@@ -660,13 +645,13 @@ describe('executeExperiment', () => {
 
       await executeExperiment(makeOptions())
 
-      // The completeExperiment call should use the experiment_complete results
+      // experiment_complete carries only metrics; results come from the stream
       const completeCall = mockConvexMutation.mock.calls.find(
         (call: unknown[]) => call[0] === 'experiments:completeExperiment'
       )!
       expect(completeCall).toBeDefined()
-      // The runner maps archetype_name -> archetype when processing experiment_complete
-      const expectedMapped = finalResults.map(r => ({
+      // The runner maps archetype_name -> archetype when processing response_complete
+      const expectedMapped = streamedResults.map(r => ({
         persona_id: r.persona_id,
         persona_name: r.persona_name,
         archetype: r.archetype_name,
@@ -682,7 +667,7 @@ describe('executeExperiment', () => {
       mockRunExperiment.mockImplementation(
         async (_request: unknown, onEvent: (event: unknown) => Promise<void>) => {
           await onEvent({ type: 'status', message: 'Initializing personas' })
-          await onEvent({ type: 'experiment_complete', results: [], metrics: {} })
+          await onEvent({ type: 'experiment_complete', metrics: {} })
         }
       )
 
@@ -709,7 +694,7 @@ describe('executeExperiment', () => {
             name: 'Alice VC',
             archetype: 'vc_partner',
           })
-          await onEvent({ type: 'experiment_complete', results: [], metrics: {} })
+          await onEvent({ type: 'experiment_complete', metrics: {} })
         }
       )
 
@@ -427,16 +427,6 @@ describe('modal-client', () => {
         },
         {
           type: 'experiment_complete',
-          results: [
-            {
-              persona_id: 'p-1',
-              persona_name: 'Bob',
-              archetype_id: 'arc-1',
-              archetype_name: 'Skeptic',
-              response: 'Not sure about this.',
-              sentiment: -0.3,
-            },
-          ],
           metrics: { avgSentiment: -0.3 },
         },
       ]
@@ -479,16 +469,6 @@ describe('modal-client', () => {
       }
       const completeEvent: ModalStreamEvent = {
         type: 'experiment_complete',
-        results: [
-          {
-            persona_id: 'p-2',
-            persona_name: 'Carol',
-            archetype_id: 'arc-2',
-            archetype_name: 'Power User',
-            response: 'I love it!',
-            sentiment: 0.95,
-          },
-        ],
         metrics: { totalResponses: 1 },
       }
 
@@ -467,6 +467,7 @@ describe('generateExperimentConfig', () => {
     expect(config.execution.maxTokens).toBe(500)
     expect(config.execution.timeout).toBe(60)
     expect(config.execution.parallelization).toBe(true)
+    expect(config.execution.batchSize).toBe(1)
   })
 
   it('derives output paths from decision filename slug', () => {
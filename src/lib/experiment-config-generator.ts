@@ -126,6 +126,7 @@ export interface ExperimentConfig {
     maxTokens: number
     timeout: number
     parallelization: boolean
+    batchSize: number
   }
   analysis: {
     metrics: AnalysisMetric[]
@@ -613,6 +614,7 @@ export function generateExperimentConfig(input: ExperimentConfigInput): string {
     maxTokens: 1024,
     timeout: 60,
     parallelization: true,
+    batchSize: 1,
   }
 
   // --- Analysis ---
@@ -71,6 +71,8 @@ interface ExperimentConfigYaml {
     maxTokens: number
     timeout: number
     parallelization: boolean
+    /** Personas answered per Claude call; 1 (or omitted) gives each its own call */
+    batchSize?: number
   }
   analysis: {
     metrics: Record<string, unknown>[]
@@ -252,16 +254,7 @@ export async function executeExperiment(
         }
 
         case 'experiment_complete':
-          allResults.length = 0
-          allResults.push(
-            ...event.results.map(r => ({
-              persona_id: r.persona_id,
-              persona_name: r.persona_name,
-              archetype: r.archetype_name,
-              response: r.response,
-              sentiment: r.sentiment,
-            }))
-          )
+          // Individual results already arrived as response_complete events
           finalMetrics = event.metrics
           break
 
@@ -35,6 +35,8 @@ export interface ModalExperimentRequest {
     maxTokens: number
     timeout: number
     parallelization: boolean
+    /** Personas answered per Claude call; 1 (or omitted) gives each its own call */
+    batchSize?: number
   }
   context: {
     files: {
@@ -106,16 +108,6 @@ export type ModalStreamEvent =
     }
   | {
       type: 'experiment_complete'
-      results: {
-        persona_id: string
-        persona_name: string
-        archetype_id: string
-        archetype_name: string
-        response: string
-        sentiment: number
-        tokens?: { input: number; output: number }
-        error?: string
-      }[]
       metrics: Record<string, unknown>
     }
   | {